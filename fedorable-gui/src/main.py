@@ -2,20 +2,27 @@
 
 import sys
 import os
-import subprocess
+import codecs
 import gi
-import threading
 import shlex
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Adw, GLib, Gio, Pango
+from gi.repository import Gtk, Adw, GLib, Gio
 
 # --- Configuration ---
 # !! IMPORTANT: Adjust this path to where your fedorable.sh script is located !!
 FEDORABLE_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fedorable.sh")
 # Used for pkexec policy
 FEDORABLE_HELPER_ID = "io.github.yourusername.fedorablehelper" # Change 'yourusername'
+# Size of each raw read from the script's stdout/stderr pipes
+READ_CHUNK_SIZE = 65536
+# Widget layout for FedorableMainWindow
+MAIN_WINDOW_UI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "data", "main_window.ui")
+
+# Banners appended to the output when a run ends
+_OK_BANNER = "\n--- Maintenance Finished Successfully ---\n"
+_FAIL_BANNER_FMT = "\n--- Maintenance Failed (Exit Code: {}) ---\n"
 
 class FedorableGtkApp(Adw.Application):
     def __init__(self, **kwargs):
@@ -23,6 +30,9 @@ class FedorableGtkApp(Adw.Application):
                          flags=Gio.ApplicationFlags.FLAGS_NONE,
                          **kwargs)
         self.window = None
+        # Result of the startup script checks; the script location doesn't change at runtime
+        self.script_ok = False
+        self.script_path = os.path.realpath(FEDORABLE_SCRIPT_PATH)
 
     def do_activate(self):
         # Create a new window if none exists
@@ -41,161 +51,98 @@ class FedorableGtkApp(Adw.Application):
                     f"Error: Fedorable script not executable!",
                     f"Please make '{FEDORABLE_SCRIPT_PATH}' executable (chmod +x)."
                  )
+            else:
+                 self.script_ok = True
 
         self.window.present()
 
+# Task checkboxes (use --no-* if *unchecked*) and option widgets (use --* if *checked*),
+# in the order they appear in the UI file; widget ids are task_<key> / option_<key>
+TASK_KEYS = (
+    "update", "autoremove", "clean_dnf", "clean_kernels", "clean_user_cache",
+    "clean_journal", "clean_temp", "clean_coredumps", "update_grub", "clean_flatpak",
+    "optimize_rpmdb", "reset_failed_units", "update_fonts", "trim", "optimize_fstrim",
+    "clean_snap", "update_mandb", "check_services",
+)
+OPTION_KEYS = (
+    "perform_timeshift", "perform_backup", "perform_update_firmware", "perform_clear_history",
+    "yes", "dry_run", "email_report", "check_only",
+)
+
+@Gtk.Template(filename=MAIN_WINDOW_UI_PATH)
 class FedorableMainWindow(Adw.ApplicationWindow):
+    __gtype_name__ = 'FedorableMainWindow'
+
+    # Template widgets
+    run_button = Gtk.Template.Child()
+    clear_button = Gtk.Template.Child()
+    output_view = Gtk.Template.Child()
+    statusbar = Gtk.Template.Child()
+
+    task_update = Gtk.Template.Child()
+    task_autoremove = Gtk.Template.Child()
+    task_clean_dnf = Gtk.Template.Child()
+    task_clean_kernels = Gtk.Template.Child()
+    task_clean_user_cache = Gtk.Template.Child()
+    task_clean_journal = Gtk.Template.Child()
+    task_clean_temp = Gtk.Template.Child()
+    task_clean_coredumps = Gtk.Template.Child()
+    task_update_grub = Gtk.Template.Child()
+    task_clean_flatpak = Gtk.Template.Child()
+    task_optimize_rpmdb = Gtk.Template.Child()
+    task_reset_failed_units = Gtk.Template.Child()
+    task_update_fonts = Gtk.Template.Child()
+    task_trim = Gtk.Template.Child()
+    task_optimize_fstrim = Gtk.Template.Child()
+    task_clean_snap = Gtk.Template.Child()
+    task_update_mandb = Gtk.Template.Child()
+    task_check_services = Gtk.Template.Child()
+
+    option_perform_timeshift = Gtk.Template.Child()
+    option_perform_backup = Gtk.Template.Child()
+    option_perform_update_firmware = Gtk.Template.Child()
+    option_perform_clear_history = Gtk.Template.Child()
+    option_yes = Gtk.Template.Child()
+    option_dry_run = Gtk.Template.Child()
+    option_email_report = Gtk.Template.Child()
+    option_check_only = Gtk.Template.Child()
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
         self.process = None
         self.stdout_tag = None
         self.stderr_tag = None
-
-        self.set_title("Fedorable Maintenance GUI")
-        self.set_default_size(800, 700)
-
-        # --- UI Elements ---
-        self.main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
-        self.set_content(self.main_box)
-
-        # Header Bar
-        header = Adw.HeaderBar()
-        self.set_titlebar(header)
-        # Add About button later if needed
-
-        # --- Task Panes ---
-        paned = Gtk.Paned(orientation=Gtk.Orientation.VERTICAL, wide_handle=True, position=350)
-        self.main_box.append(paned)
-
-        # Top Pane: Controls
-        controls_scrolled_window = Gtk.ScrolledWindow()
-        controls_scrolled_window.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
-        controls_scrolled_window.set_vexpand(False)
-        paned.set_start_child(controls_scrolled_window)
-
-        controls_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=15, margin_top=10, margin_bottom=10, margin_start=10, margin_end=10)
-        controls_scrolled_window.set_child(controls_box)
-
-        # --- Checkboxes for Tasks ---
-        tasks_frame = Gtk.Frame(label=" Maintenance Tasks ")
-        tasks_grid = Gtk.Grid(column_spacing=10, row_spacing=5, margin_top=5, margin_bottom=5, margin_start=5, margin_end=5)
-        tasks_frame.set_child(tasks_grid)
-        controls_box.append(tasks_frame)
-
-        self.task_checkboxes = {}
-        # Define tasks (key: internal name, value: display label, default state)
-        tasks = {
-            "update": ("Update System Packages", True),
-            "autoremove": ("Autoremove Unused Packages", True),
-            "clean_dnf": ("Clean DNF Cache", True),
-            "clean_kernels": ("Remove Old Kernels", True),
-            "clean_user_cache": ("Clean User Caches (Thumbnails)", True),
-            "clean_journal": ("Clean System Journal", True),
-            "clean_temp": ("Clean Temp Files", True),
-            "clean_coredumps": ("Clean Coredumps", True),
-            "update_grub": ("Update GRUB/Bootloader", True),
-            "clean_flatpak": ("Clean/Update Flatpak", True),
-            "optimize_rpmdb": ("Optimize RPM Database", True),
-            "reset_failed_units": ("Reset Failed Systemd Units", True),
-            "update_fonts": ("Update Font Cache", True),
-            "trim": ("Run SSD TRIM", True),
-            "optimize_fstrim": ("Optimize fstrim Timer", True),
-            "clean_snap": ("Clean Snap Packages", True),
-            "update_mandb": ("Update Man Database", True),
-            "check_services": ("Check Service Health", True),
-        }
-        row, col = 0, 0
-        for key, (label, default) in tasks.items():
-            cb = Gtk.CheckButton(label=label)
-            cb.set_active(default)
-            self.task_checkboxes[key] = cb
-            tasks_grid.attach(cb, col, row, 1, 1)
-            col += 1
-            if col > 1: # Adjust number of columns
-                col = 0
-                row += 1
-
-        # --- Checkboxes/Switches for Options ---
-        options_frame = Gtk.Frame(label=" Options ")
-        options_grid = Gtk.Grid(column_spacing=10, row_spacing=5, margin_top=5, margin_bottom=5, margin_start=5, margin_end=5)
-        options_frame.set_child(options_grid)
-        controls_box.append(options_frame)
-
-        self.option_switches = {}
-         # Define options (key: internal name, value: display label, default state)
-        options = {
-            # --- Actions (use CheckButton) ---
-            "perform_timeshift": ("Perform Timeshift Snapshot", False),
-            "perform_backup": ("Perform Config Backup", False),
-            "perform_update_firmware": ("Update Firmware (fwupdmgr)", False),
-            "perform_clear_history": ("Clear Shell History (Caution!)", False),
-             # --- Modifiers (use Switch for on/off style) ---
-            "yes": ("Assume 'Yes' to prompts (--yes)", False),
-            "dry_run": ("Dry Run (No changes made)", False),
-            "email_report": ("Send Email Report (Configure /etc/fedorable.conf)", False),
-             # quiet mode doesn't make sense for GUI
-             "check_only" : ("Check for Updates Only (--check-only)", False),
-        }
-        row, col = 0, 0
-        for key, (label, default) in options.items():
-            # Use Switch for modifiers, CheckButton for actions
-            if key in ["yes", "dry_run", "email_report", "check_only"]:
-                widget = Gtk.Switch()
-                widget.set_active(default)
-                # Align switch with label better
-                hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
-                hbox.append(Gtk.Label(label=label, xalign=0))
-                hbox.append(widget)
-                options_grid.attach(hbox, col, row, 1, 1)
-
-            else: # Actions
-                widget = Gtk.CheckButton(label=label)
-                widget.set_active(default)
-                options_grid.attach(widget, col, row, 1, 1)
-
-            self.option_switches[key] = widget
-            col += 1
-            if col > 1: # Adjust columns
-                col = 0
-                row += 1
-
-        # --- Run Button ---
-        run_button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, halign=Gtk.Align.CENTER, spacing=10, margin_top=15)
-        controls_box.append(run_button_box)
-
-        self.run_button = Gtk.Button(label="Run Maintenance")
-        self.run_button.get_style_context().add_class("suggested-action")
-        self.run_button.connect("clicked", self.on_run_clicked)
-        run_button_box.append(self.run_button)
-
-        self.clear_button = Gtk.Button(label="Clear Output")
-        self.clear_button.connect("clicked", self.on_clear_clicked)
-        run_button_box.append(self.clear_button)
-
-        # --- Bottom Pane: Output ---
-        output_scrolled_window = Gtk.ScrolledWindow()
-        output_scrolled_window.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
-        output_scrolled_window.set_vexpand(True)
-        paned.set_end_child(output_scrolled_window)
-
-        self.output_view = Gtk.TextView()
-        self.output_view.set_editable(False)
-        self.output_view.set_cursor_visible(False)
-        self.output_view.set_monospace(True)
+        # Output waiting to be inserted into the TextView, keyed by tag
+        self._pending = {}
+        self._flush_source_id = None
+        # A run is over once the process has exited *and* both pipes hit EOF
+        self._open_streams = 0
+        self._exit_status = None
+
+        self.task_checkboxes = {key: getattr(self, f"task_{key}") for key in TASK_KEYS}
+        self.option_switches = {key: getattr(self, f"option_{key}") for key in OPTION_KEYS}
+
+        # Precompute the CLI flag for each widget so build_command is just a get_active() sweep
+        self._task_flags = [(cb, f"--no-{key.replace('_', '-')}") # e.g., --no-clean-dnf
+                            for key, cb in self.task_checkboxes.items()]
+        self._option_flags = [(sw, f"--{key.replace('_', '-')}") # e.g., --dry-run, --perform-backup
+                              for key, sw in self.option_switches.items()]
+
+        # --- Output ---
+        self._buffer = self.output_view.get_buffer()
         # Pango tag for stderr (red color)
-        self.stderr_tag = self.output_view.get_buffer().create_tag("stderr", foreground="red")
-        self.stdout_tag = self.output_view.get_buffer().create_tag("stdout", foreground="black") # Default color
-        output_scrolled_window.set_child(self.output_view)
+        self.stderr_tag = self._buffer.create_tag("stderr", foreground="red")
+        self.stdout_tag = self._buffer.create_tag("stdout", foreground="black") # Default color
+        # Right-gravity mark that stays at the end of the buffer, used for auto-scroll
+        self._end_mark = self._buffer.create_mark("end", self._buffer.get_end_iter(), False)
+        self._pending = {self.stdout_tag: [], self.stderr_tag: []}
 
         # --- Status Bar ---
-        self.statusbar = Gtk.Statusbar()
-        self.statusbar_context_id = self.statusbar.get_context_id("FedorableStatus")
-        self.main_box.append(self.statusbar)
         self.update_statusbar("Ready.")
 
     def update_statusbar(self, text):
-        self.statusbar.push(self.statusbar_context_id, text)
+        self.statusbar.set_text(text)
 
     def show_error_dialog(self, primary_text, secondary_text):
         dialog = Adw.MessageDialog(transient_for=self, modal=True)
@@ -207,9 +154,9 @@ class FedorableMainWindow(Adw.ApplicationWindow):
         dialog.connect("response", lambda d, r: d.close())
         dialog.present()
 
+    @Gtk.Template.Callback()
     def on_clear_clicked(self, button):
-        buffer = self.output_view.get_buffer()
-        buffer.set_text("")
+        self._buffer.set_text("")
         self.update_statusbar("Output cleared.")
 
     def set_controls_sensitive(self, sensitive):
@@ -226,97 +173,117 @@ class FedorableMainWindow(Adw.ApplicationWindow):
     def build_command(self):
         """Builds the shell command based on checkbox states."""
         # Use pkexec to request privileges for the specific script
-        command = ["pkexec", FEDORABLE_SCRIPT_PATH]
-
+        command = ["pkexec", self.get_application().script_path]
         # Add task flags (use --no-* if checkbox is *unchecked*)
-        for key, cb in self.task_checkboxes.items():
-            if not cb.get_active():
-                command.append(f"--no-{key.replace('_', '-')}") # e.g., --no-clean-dnf
-
+        command += [flag for cb, flag in self._task_flags if not cb.get_active()]
         # Add option flags (use --* if checkbox/switch is *checked*)
-        for key, sw in self.option_switches.items():
-             # Check if it's a switch or checkbox - switches have get_state() in some GTK versions, get_active() is safer
-            is_active = sw.get_active()
-
-            if is_active:
-                if key == "yes":
-                    command.append("--yes")
-                elif key == "dry_run":
-                    command.append("--dry-run")
-                elif key == "email_report":
-                    command.append("--email-report")
-                elif key == "check_only":
-                     command.append("--check-only")
-                # Handle actions (--perform-*)
-                elif key.startswith("perform_"):
-                     command.append(f"--{key.replace('_', '-')}")
-
-
+        # Switches have get_state() in some GTK versions, get_active() is safer
+        command += [flag for sw, flag in self._option_flags if sw.get_active()]
         return command
 
     def append_output(self, text, tag):
         """Appends text to the output view with a specific tag (runs on main thread)."""
-        buffer = self.output_view.get_buffer()
+        buffer = self._buffer
         buffer.insert_with_tags(buffer.get_end_iter(), text, tag)
-        # Auto-scroll
-        adj = self.output_view.get_parent().get_vadjustment() # ScrolledWindow adjustment
-        adj.set_value(adj.get_upper() - adj.get_page_size())
+        self.scroll_to_end()
         return False # Important for GLib.idle_add
 
-    def handle_stream(self, channel, condition, tag):
-        """Reads from stdout or stderr channel."""
-        if condition == GLib.IOCondition.HUP:
-            return False # Stop watching if channel closed
-
+    def scroll_to_end(self):
+        """Auto-scroll via the end mark; GTK resolves it on its next layout pass."""
+        self._buffer.move_mark(self._end_mark, self._buffer.get_end_iter())
+        self.output_view.scroll_mark_onscreen(self._end_mark)
+
+    def queue_output(self, text, tag):
+        """Queues text and arms a single flush ~16ms out if none is scheduled yet."""
+        self._pending[tag].append(text)
+        if self._flush_source_id is None:
+            self._flush_source_id = GLib.timeout_add(16, self._flush_output)
+
+    def _flush_output(self):
+        """Inserts all queued output in one go (runs on main thread, at most ~60Hz)."""
+        pending = self._pending
+        self._pending = {tag: [] for tag in pending}
+        self._flush_source_id = None
+
+        buffer = self._buffer
+        inserted = False
+        for tag, chunks in pending.items():
+            if chunks:
+                buffer.insert_with_tags(buffer.get_end_iter(), "".join(chunks), tag)
+                inserted = True
+        if inserted:
+            self.scroll_to_end() # Once per flush rather than once per line
+        # The next queue_output re-arms the timer, so a quiet script causes no wakeups
+        return GLib.SOURCE_REMOVE
+
+    def read_stream(self, stream, tag, decoder):
+        """Requests the next block from a stdout or stderr pipe."""
+        stream.read_bytes_async(READ_CHUNK_SIZE, GLib.PRIORITY_DEFAULT, None,
+                                self.handle_stream, (tag, decoder))
+
+    def handle_stream(self, stream, result, user_data):
+        """Queues a block read from stdout or stderr and re-arms the read until EOF."""
+        tag, decoder = user_data
         try:
-            line = channel.readline() # Read available data
-            if line:
-                # Schedule GUI update on the main thread
-                GLib.idle_add(self.append_output, line, tag)
-            else:
-                # End of stream
-                return False
+            data = stream.read_bytes_finish(result).get_data()
+            if data:
+                # Picked up by the periodic flush
+                self.queue_output(decoder.decode(data, final=False), tag)
+                self.read_stream(stream, tag, decoder)
+                return
+            tail = decoder.decode(b'', final=True) # End of stream
+            if tail:
+                self.queue_output(tail, tag)
         except Exception as e:
             print(f"Error reading stream: {e}") # Log to console
-            GLib.idle_add(self.append_output, f"\n[GUI Error reading stream: {e}]\n", self.stderr_tag)
-            return False # Stop watching on error
+            self.queue_output(f"\n[GUI Error reading stream: {e}]\n", self.stderr_tag)
 
-        return True # Continue watching
+        self._open_streams -= 1
+        self._maybe_finish()
 
-    def process_finished(self, pid, status):
+    def process_finished(self, process, result):
         """Callback when the subprocess finishes."""
-        success = os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
-        GLib.idle_add(self._finalize_run, success, os.WEXITSTATUS(status))
-        self.process = None # Reset process variable
-
+        try:
+            process.wait_finish(result)
+            self._exit_status = process.get_exit_status() if process.get_if_exited() else -1
+        except GLib.Error as e:
+            print(f"Error waiting for process: {e.message}")
+            self._exit_status = -1
+        self._maybe_finish()
+
+    def _maybe_finish(self):
+        if self._open_streams == 0 and self._exit_status is not None:
+            self.process = None # Reset process variable
+            self._finalize_run(self._exit_status == 0, self._exit_status)
 
     def _finalize_run(self, success, exit_status):
         """Update UI after process finishes (runs on main thread)."""
+        if self._flush_source_id is not None:
+            GLib.source_remove(self._flush_source_id)
+            self._flush_output() # Drain queued output before the summary banner
         if success:
             self.update_statusbar("Maintenance finished successfully.")
-            self.append_output("\n--- Maintenance Finished Successfully ---\n", self.stdout_tag)
+            self.append_output(_OK_BANNER, self.stdout_tag)
         else:
              self.update_statusbar(f"Maintenance failed (Exit Code: {exit_status}). Check output.")
-             self.append_output(f"\n--- Maintenance Failed (Exit Code: {exit_status}) ---\n", self.stderr_tag)
+             self.append_output(_FAIL_BANNER_FMT.format(exit_status), self.stderr_tag)
 
         self.set_controls_sensitive(True) # Re-enable controls
         # Clean up IO watches maybe? Should happen automatically on HUP/error.
         return False # For GLib.idle_add
 
+    @Gtk.Template.Callback()
     def on_run_clicked(self, button):
         """Starts the maintenance script."""
         if self.process:
             self.update_statusbar("Maintenance is already running.")
             return
 
-        if not os.path.exists(FEDORABLE_SCRIPT_PATH):
-             self.show_error_dialog("Error: Script not found", f"Cannot run: {FEDORABLE_SCRIPT_PATH}")
-             return
-        if not os.access(FEDORABLE_SCRIPT_PATH, os.X_OK):
-             self.show_error_dialog("Error: Script not executable", f"Cannot run: {FEDORABLE_SCRIPT_PATH}")
+        # Checked once in do_activate
+        if not self.get_application().script_ok:
+             self.show_error_dialog("Error: Script not found or not executable", f"Cannot run: {FEDORABLE_SCRIPT_PATH}")
              return
 
-
         command = self.build_command()
         self.on_clear_clicked(None) # Clear previous output
         self.update_statusbar("Starting maintenance...")
@@ -324,34 +291,31 @@ class FedorableMainWindow(Adw.ApplicationWindow):
         self.set_controls_sensitive(False) # Disable controls
 
         try:
-            # Use Popen for non-blocking execution and stream redirection
-            self.process = subprocess.Popen(
+            # Spawn async process using GSubprocess; its pipes and exit are driven by the main loop
+            self.process = Gio.Subprocess.new(
                 command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,  # Decode streams as text
-                bufsize=1,  # Line buffered
-                universal_newlines=True # Consistent line endings
+                Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_PIPE
             )
+            self._open_streams = 2
+            self._exit_status = None
 
-            # Watch stdout
-            stdout_channel = GLib.IOChannel(self.process.stdout.fileno())
-            GLib.io_add_watch(stdout_channel, GLib.IOCondition.IN | GLib.IOCondition.HUP,
-                              self.handle_stream, self.stdout_tag)
-
-            # Watch stderr
-            stderr_channel = GLib.IOChannel(self.process.stderr.fileno())
-            GLib.io_add_watch(stderr_channel, GLib.IOCondition.IN | GLib.IOCondition.HUP,
-                              self.handle_stream, self.stderr_tag)
+            # One incremental decoder per stream so multi-byte characters split across reads survive
+            self.read_stream(self.process.get_stdout_pipe(), self.stdout_tag,
+                             codecs.getincrementaldecoder('utf-8')(errors='replace'))
+            self.read_stream(self.process.get_stderr_pipe(), self.stderr_tag,
+                             codecs.getincrementaldecoder('utf-8')(errors='replace'))
 
-             # Watch for process completion using GLib.child_watch_add
-             # PID, callback function, user_data (optional)
-            GLib.child_watch_add(GLib.PRIORITY_DEFAULT, self.process.pid, self.process_finished)
+            # Watch for process completion
+            self.process.wait_async(None, self.process_finished)
 
 
-        except FileNotFoundError:
-             self.show_error_dialog("Error: pkexec not found", "Ensure 'pkexec' (part of Polkit) is installed.")
-             self._finalize_run(False, -1) # Simulate failure
+        except GLib.Error as e:
+            if e.matches(GLib.spawn_error_quark(), GLib.SpawnError.NOENT):
+                self.show_error_dialog("Error: pkexec not found", "Ensure 'pkexec' (part of Polkit) is installed.")
+            else:
+                print(f"Failed to start process: {e.message}") # Log raw error to console
+                self.show_error_dialog("Error Starting Process", f"Could not launch the maintenance script.\nDetails: {e.message}")
+            self._finalize_run(False, -1) # Simulate failure
         except Exception as e:
             error_msg = f"Failed to start process: {e}"
             print(error_msg) # Log raw error to console
@@ -1,13 +1,18 @@
 # src/tasks.py
 import subprocess
 import os
+import shutil
+import stat
 from pathlib import Path
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 class SystemTasks:
     def __init__(self):
         if os.geteuid() != 0:
             raise PermissionError("This application must be run as root")
+        # dnf5's solver is much faster than the dnf4 Python frontend
+        self.dnf = 'dnf5' if shutil.which('dnf5') else 'dnf'
     
     def backup_system_config(self):
         backup_dir = Path(f"/root/system_backup_{datetime.date.today().strftime('%Y%m%d')}")
@@ -21,38 +26,64 @@ class SystemTasks:
             "/etc/hosts"
         ]
         
-        for config in configs:
+        # The copies are independent and I/O-bound, so overlap them
+        with ThreadPoolExecutor(max_workers=len(configs)) as executor:
+            list(executor.map(lambda config: self._copy_config(config, backup_dir), configs))
+    
+    def _copy_config(self, config, backup_dir):
+        try:
+            # One stat call answers both "exists?" and "is it a directory?"
             try:
-                if Path(config).exists():
-                    if Path(config).is_dir():
-                        subprocess.run(['cp', '-r', config, str(backup_dir)], check=True)
-                    else:
-                        subprocess.run(['cp', config, str(backup_dir)], check=True)
-            except subprocess.CalledProcessError:
-                print(f"Failed to backup {config}")
+                mode = os.stat(config).st_mode
+            except FileNotFoundError:
+                return
+            if stat.S_ISDIR(mode):
+                shutil.copytree(config, backup_dir / os.path.basename(config), symlinks=True, dirs_exist_ok=True)
+            else:
+                shutil.copy2(config, backup_dir)
+        except OSError:
+            print(f"Failed to backup {config}")
     
     def update_system(self):
-        subprocess.run(['dnf', 'check-upgrade'], check=True)
-        subprocess.run(['dnf', 'upgrade', '-y'], check=True)
+        # upgrade does its own check and is a no-op when nothing is pending
+        subprocess.run([self.dnf, 'upgrade', '-y'], check=True)
     
     def cleanup_system(self):
-        subprocess.run(['dnf', 'autoremove', '-y'], check=True)
-        subprocess.run(['dnf', 'clean', 'all'], check=True)
-        subprocess.run(['dnf', 'clean', 'dbcache'], check=True)
-        subprocess.run(['dnf', 'makecache'], check=True)
-        try:
-            subprocess.run(
-                ['dnf', 'remove', '$(dnf repoquery --installonly --latest-limit=-2 -q)', '-y'],
-                shell=True
-            )
-        except subprocess.CalledProcessError:
-            pass
+        # Query old kernels once and hand their NVRs straight to remove (no shell);
+        # done first so it reuses the metadata cache instead of refetching it after 'clean all'
+        old_kernels = subprocess.run(
+            [self.dnf, 'repoquery', '--installonly', '--latest-limit=-2', '-q'],
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        if old_kernels:
+            subprocess.run([self.dnf, 'remove', '-y', *old_kernels], check=False)
+        subprocess.run([self.dnf, '-y', 'autoremove'], check=True)
+        # 'clean all' already covers dbcache; kept last so nothing after it needs metadata
+        subprocess.run([self.dnf, 'clean', 'all'], check=True)
     
     def cleanup_user_data(self):
-        subprocess.run(['find', '/home/', '-type', 'f', '-name', '.thumbnails', '-exec', 'rm', '-rf', '{}', '+'])
-        subprocess.run(['find', '/home/', '-type', 'f', '-name', '.cache', '-exec', 'rm', '-rf', '{}', '+'])
-        subprocess.run(['>', '/root/.bash_history'], shell=True)
-        subprocess.run(['find', '/home', '-name', '.bash_history', '-exec', 'sh', '-c', '> {}', ';'])
+        self._truncate_history('/root/.bash_history')
+        with os.scandir('/home') as homes:
+            for entry in homes:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                for sub in ('.thumbnails', '.cache'):
+                    path = os.path.join(entry.path, sub)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                self._truncate_history(os.path.join(entry.path, '.bash_history'))
+    
+    def _truncate_history(self, path):
+        # Runs as root on user-controlled paths: never follow a symlink, only truncate regular files
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+        except OSError:
+            return # Missing, or a symlink (ELOOP)
+        try:
+            if stat.S_ISREG(os.fstat(fd).st_mode):
+                os.ftruncate(fd, 0)
+        finally:
+            os.close(fd)
     
     def optimize_system(self):
         subprocess.run(['grub2-mkconfig', '-o', '/boot/grub2/grub.cfg'], check=True)
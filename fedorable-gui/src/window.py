@@ -1,4 +1,5 @@
 # src/window.py
+import threading
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
@@ -30,19 +31,17 @@ class FedorableWindow(Adw.ApplicationWindow):
             "System Optimization"
         ]
         
+        self._task_switches = []
         for i, name in enumerate(task_names, 1):
             row = Adw.ActionRow(title=name)
             switch = Gtk.Switch(valign=Gtk.Align.CENTER)
             row.add_suffix(switch)
             self.tasks_list.append(row)
+            self._task_switches.append(switch)
     
     @Gtk.Template.Callback()
     def on_run_clicked(self, button):
-        selected_tasks = []
-        for i, row in enumerate(self.tasks_list):
-            switch = row.get_last_child()
-            if switch.get_active():
-                selected_tasks.append(i + 1)
+        selected_tasks = [i + 1 for i, switch in enumerate(self._task_switches) if switch.get_active()]
         
         if not selected_tasks:
             dialog = Adw.MessageDialog(
@@ -59,18 +58,42 @@ class FedorableWindow(Adw.ApplicationWindow):
     def run_tasks(self, task_numbers):
         self.run_button.set_sensitive(False)
         self.main_stack.set_visible_child_name('progress')
+        self.progress_bar.set_fraction(0.0)
+        self.status_label.set_text(f"Running task {task_numbers[0]}...")
+        threading.Thread(target=self._worker, args=(task_numbers,), daemon=True).start()
+    
+    def _worker(self, task_numbers):
         total_tasks = len(task_numbers)
         
-        for i, task_num in enumerate(task_numbers):
-            progress = (i / total_tasks)
-            self.progress_bar.set_fraction(progress)
-            GLib.idle_add(
-                self.status_label.set_text,
-                f"Running task {task_num}..."
-            )
-            self.tasks.run_task(task_num)
+        failed_tasks = []
         
+        try:
+            # Progress only moves when a task completes, so post one update per task
+            for i, task_num in enumerate(task_numbers):
+                try:
+                    self.tasks.run_task(task_num)
+                except Exception as e:
+                    failed_tasks.append(task_num)
+                    GLib.idle_add(self.status_label.set_text, f"Task {task_num} failed: {e}")
+                next_task = task_numbers[i + 1] if i + 1 < total_tasks else None
+                GLib.idle_add(self._update_progress, i + 1, total_tasks, next_task)
+        finally:
+            # Always hand the UI back, even if something above blew up
+            GLib.idle_add(self._tasks_done, failed_tasks)
+    
+    def _update_progress(self, done, total, next_task):
+        self.progress_bar.set_fraction(done / total)
+        if next_task is not None:
+            self.status_label.set_text(f"Running task {next_task}...")
+        return False
+    
+    def _tasks_done(self, failed_tasks):
         self.progress_bar.set_fraction(1.0)
-        self.status_label.set_text("Tasks completed!")
+        if failed_tasks:
+            failed = ", ".join(str(n) for n in failed_tasks)
+            self.status_label.set_text(f"Tasks completed with errors (failed: {failed})")
+        else:
+            self.status_label.set_text("Tasks completed!")
         self.run_button.set_sensitive(True)
-        self.main_stack.set_visible_child_name('tasks')
\ No newline at end of file
+        self.main_stack.set_visible_child_name('tasks')
+        return False
\ No newline at end of file
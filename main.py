@@ -2,18 +2,36 @@
 
 import sys
 import os
+import codecs
 import subprocess
 import gi
 import threading
 import shlex
+import time
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Adw, GLib, Gio, Pango
+from gi.repository import Gtk, Adw, GLib, Gio
 
 # --- Configuration ---
 FEDORABLE_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fedorable.sh")
 FEDORABLE_HELPER_ID = "io.github.v8v88v8v88.fedorablehelper" # Example - Use your unique ID
+_CMD_PREFIX = ("pkexec", FEDORABLE_SCRIPT_PATH)
+# Output view is trimmed back to OUTPUT_TRIM_CHARS once it grows past OUTPUT_MAX_CHARS;
+# the trimmed text is appended to a per-run file under OUTPUT_SPILL_DIR so nothing is lost
+# (only the newest OUTPUT_SPILL_KEEP of those files are kept)
+OUTPUT_MAX_CHARS = 500_000
+OUTPUT_TRIM_CHARS = 250_000
+OUTPUT_SPILL_DIR = os.path.join(GLib.get_user_cache_dir(), "fedorable")
+OUTPUT_SPILL_KEEP = 5
+OUTPUT_CSS = """
+textview.fedorable-output {
+    font-family: monospace;
+    font-variant-numeric: tabular-nums;
+}
+"""
+READ_CHUNK_SIZE = 65536
+OUTPUT_TAB_COLUMNS = 8 # Fixed tab stop, in digit widths of the monospace output font
 
 class FedorableGtkApp(Adw.Application):
     def __init__(self, **kwargs):
@@ -21,17 +39,39 @@ class FedorableGtkApp(Adw.Application):
                          flags=Gio.ApplicationFlags.FLAGS_NONE,
                          **kwargs)
         self.window = None
+        self._script_status = None # Cached (exists, executable); None means "stat again"
+        self._script_monitor = None
+
+    def script_status(self):
+        """Returns (exists, executable) for the script, with one stat() per change on disk."""
+        if self._script_status is None:
+            try:
+                mode = os.stat(FEDORABLE_SCRIPT_PATH).st_mode
+                self._script_status = (True, bool(mode & 0o111))
+            except OSError:
+                self._script_status = (False, False)
+        return self._script_status
+
+    def _watch_script(self):
+        script_dir = Gio.File.new_for_path(os.path.dirname(FEDORABLE_SCRIPT_PATH))
+        self._script_monitor = script_dir.monitor_directory(Gio.FileMonitorFlags.NONE, None)
+        self._script_monitor.connect("changed", self._on_script_dir_changed)
+
+    def _on_script_dir_changed(self, monitor, file, other_file, event_type):
+        self._script_status = None
 
     def do_activate(self):
         if not self.window:
             self.window = FedorableMainWindow(application=self)
-            if not os.path.exists(FEDORABLE_SCRIPT_PATH):
+            self._watch_script()
+            exists, executable = self.script_status()
+            if not exists:
                  self.window.show_error_dialog(
                     f"Error: Fedorable script not found!",
                     f"Please ensure '{FEDORABLE_SCRIPT_PATH}' exists and is executable.\n"
                     "You might need to adjust the FEDORABLE_SCRIPT_PATH variable in the Python script."
                  )
-            elif not os.access(FEDORABLE_SCRIPT_PATH, os.X_OK):
+            elif not executable:
                  self.window.show_error_dialog(
                     f"Error: Fedorable script not executable!",
                     f"Please make '{FEDORABLE_SCRIPT_PATH}' executable (chmod +x)."
@@ -45,6 +85,15 @@ class FedorableMainWindow(Adw.ApplicationWindow):
         self.process = None
         self.stdout_tag = None
         self.stderr_tag = None
+        self._pending_stdout = []
+        self._pending_stderr = []
+        self._pending_lock = threading.Lock()
+        self._flush_source_id = None
+        self._open_streams = 0
+        self._exit_status = None
+        self._follow_tail = True
+        self._merge_output = False
+        self._spill_file = None # Open file receiving text trimmed from the view during this run
 
         self.set_title("Fedorable Maintenance GUI")
         self.set_default_size(800, 700)
@@ -77,74 +126,74 @@ class FedorableMainWindow(Adw.ApplicationWindow):
         tasks_frame.set_child(tasks_grid)
         controls_box.append(tasks_frame)
 
-        self.task_checkboxes = {}
-        tasks = {
-            "update": ("Update System Packages", True),
-            "autoremove": ("Autoremove Unused Packages", True),
-            "clean_dnf": ("Clean DNF Cache", True),
-            "clean_kernels": ("Remove Old Kernels", True),
-            "clean_user_cache": ("Clean User Caches (Thumbnails)", True),
-            "clean_journal": ("Clean System Journal", True),
-            "clean_temp": ("Clean Temp Files", True),
-            "clean_coredumps": ("Clean Coredumps", True),
-            "update_grub": ("Update GRUB/Bootloader", True),
-            "clean_flatpak": ("Clean/Update Flatpak", True),
-            "optimize_rpmdb": ("Optimize RPM Database", True),
-            "reset_failed_units": ("Reset Failed Systemd Units", True),
-            "update_fonts": ("Update Font Cache", True),
-            "trim": ("Run SSD TRIM", True),
-            "optimize_fstrim": ("Optimize fstrim Timer", True),
-            "clean_snap": ("Clean Snap Packages", True),
-            "update_mandb": ("Update Man Database", True),
-            "check_services": ("Check Service Health", True),
-        }
-        row, col = 0, 0
-        for key, (label, default) in tasks.items():
-            cb = Gtk.CheckButton(label=label)
-            cb.set_active(default)
-            self.task_checkboxes[key] = cb
-            tasks_grid.attach(cb, col, row, 1, 1)
-            col += 1
-            if col > 1:
-                col = 0
-                row += 1
-
         # --- Checkboxes/Switches for Options ---
         options_frame = Gtk.Frame(label=" Options ")
         options_grid = Gtk.Grid(column_spacing=10, row_spacing=5, margin_top=5, margin_bottom=5, margin_start=5, margin_end=5)
         options_frame.set_child(options_grid)
         controls_box.append(options_frame)
 
+        # (key, label, default, kind) - "check" is a CheckButton, "switch" a labelled Switch
+        tasks = (
+            ("update", "Update System Packages", True, "check"),
+            ("autoremove", "Autoremove Unused Packages", True, "check"),
+            ("clean_dnf", "Clean DNF Cache", True, "check"),
+            ("clean_kernels", "Remove Old Kernels", True, "check"),
+            ("clean_user_cache", "Clean User Caches (Thumbnails)", True, "check"),
+            ("clean_journal", "Clean System Journal", True, "check"),
+            ("clean_temp", "Clean Temp Files", True, "check"),
+            ("clean_coredumps", "Clean Coredumps", True, "check"),
+            ("update_grub", "Update GRUB/Bootloader", True, "check"),
+            ("clean_flatpak", "Clean/Update Flatpak", True, "check"),
+            ("optimize_rpmdb", "Optimize RPM Database", True, "check"),
+            ("reset_failed_units", "Reset Failed Systemd Units", True, "check"),
+            ("update_fonts", "Update Font Cache", True, "check"),
+            ("trim", "Run SSD TRIM", True, "check"),
+            ("optimize_fstrim", "Optimize fstrim Timer", True, "check"),
+            ("clean_snap", "Clean Snap Packages", True, "check"),
+            ("update_mandb", "Update Man Database", True, "check"),
+            ("check_services", "Check Service Health", True, "check"),
+        )
+        options = (
+            ("perform_timeshift", "Perform Timeshift Snapshot", False, "check"),
+            ("perform_backup", "Perform Config Backup", False, "check"),
+            ("perform_update_firmware", "Update Firmware (fwupdmgr)", False, "check"),
+            ("perform_clear_history", "Clear Shell History (Caution!)", False, "check"),
+            ("yes", "Assume 'Yes' to prompts (--yes)", False, "switch"),
+            ("dry_run", "Dry Run (No changes made)", False, "switch"),
+            ("email_report", "Send Email Report (Configure /etc/fedorable.conf)", False, "switch"),
+            ("check_only", "Check for Updates Only (--check-only)", False, "switch"),
+        )
+
+        self.task_checkboxes = {}
         self.option_switches = {}
-        options = {
-            "perform_timeshift": ("Perform Timeshift Snapshot", False),
-            "perform_backup": ("Perform Config Backup", False),
-            "perform_update_firmware": ("Update Firmware (fwupdmgr)", False),
-            "perform_clear_history": ("Clear Shell History (Caution!)", False),
-            "yes": ("Assume 'Yes' to prompts (--yes)", False),
-            "dry_run": ("Dry Run (No changes made)", False),
-            "email_report": ("Send Email Report (Configure /etc/fedorable.conf)", False),
-            "check_only" : ("Check for Updates Only (--check-only)", False),
-        }
-        row, col = 0, 0
-        for key, (label, default) in options.items():
-            if key in ["yes", "dry_run", "email_report", "check_only"]:
-                widget = Gtk.Switch()
-                widget.set_active(default)
-                hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
-                hbox.append(Gtk.Label(label=label, xalign=0))
-                hbox.append(widget)
-                options_grid.attach(hbox, col, row, 1, 1)
-            else:
-                widget = Gtk.CheckButton(label=label)
+        for grid, widgets, specs in ((tasks_grid, self.task_checkboxes, tasks),
+                                     (options_grid, self.option_switches, options)):
+            for i, (key, label, default, kind) in enumerate(specs):
+                if kind == "switch":
+                    widget = Gtk.Switch.new()
+                    label_widget = Gtk.Label.new(label)
+                    label_widget.set_xalign(0)
+                    hbox = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 6)
+                    hbox.append(label_widget)
+                    hbox.append(widget)
+                    child = hbox
+                else:
+                    widget = child = Gtk.CheckButton.new_with_label(label)
                 widget.set_active(default)
-                options_grid.attach(widget, col, row, 1, 1)
-
-            self.option_switches[key] = widget
-            col += 1
-            if col > 1:
-                col = 0
-                row += 1
+                widgets[key] = widget
+                grid.attach(child, i % 2, i // 2, 1, 1) # Two columns
+
+        # CLI flag for each task/option, computed once rather than on every Run
+        self._task_flag = {key: f"--no-{key.replace('_', '-')}" for key, *_ in tasks}
+        self._option_flag = {
+            "yes": "--yes",
+            "dry_run": "--dry-run",
+            "email_report": "--email-report",
+            "check_only": "--check-only",
+            **{key: f"--{key.replace('_', '-')}" for key, *_ in options if key.startswith("perform_")},
+        }
+        # The widget set is fixed from here on, so build_command is generated for it
+        self.build_command = self._compile_build_command()
 
         # --- Run Button ---
         run_button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, halign=Gtk.Align.CENTER, spacing=10, margin_top=15)
@@ -160,6 +209,15 @@ class FedorableMainWindow(Adw.ApplicationWindow):
         self.clear_button.connect("clicked", self.on_clear_clicked)
         run_button_box.append(self.clear_button)
 
+        # Wrapping is the expensive layout path, so it's off unless asked for
+        self.wrap_button = Gtk.ToggleButton(label="Wrap Lines")
+        self.wrap_button.connect("toggled", self.on_wrap_toggled)
+        run_button_box.append(self.wrap_button)
+
+        # Merged output needs one pipe, one reader and no tag runs; splitting it is for debugging
+        self.separate_stderr_check = Gtk.CheckButton(label="Separate stderr (color red)")
+        run_button_box.append(self.separate_stderr_check)
+
         # --- Bottom Pane: Output ---
         output_scrolled_window = Gtk.ScrolledWindow()
         output_scrolled_window.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
@@ -170,21 +228,45 @@ class FedorableMainWindow(Adw.ApplicationWindow):
         self.output_view.set_editable(False)
         self.output_view.set_cursor_visible(False)
         self.output_view.set_monospace(True)
-        self.stderr_tag = self.output_view.get_buffer().create_tag("stderr", foreground="red")
-        self.stdout_tag = self.output_view.get_buffer().create_tag("stdout", foreground="black")
+        self.output_view.set_wrap_mode(Gtk.WrapMode.NONE)
+        self._setup_output_style()
+        self._buffer = self.output_view.get_buffer()
+        self.stderr_tag = self._buffer.create_tag("stderr", foreground="red")
+        self.stdout_tag = self._buffer.create_tag("stdout", foreground="black")
         output_scrolled_window.set_child(self.output_view)
 
+        # Track whether the user is at the bottom instead of probing the adjustment on every insert
+        vadjustment = output_scrolled_window.get_vadjustment()
+        vadjustment.connect("notify::value", self._on_output_scrolled)
+        vadjustment.connect("notify::upper", self._on_output_grown)
+
         # --- Status Bar ---
-        self.statusbar = Gtk.Statusbar()
-        # Statusbar methods are deprecated, but let's keep it functional for now
-        # No easy direct replacement without using Toasts etc.
-        self.statusbar_context_id = self.statusbar.get_context_id("FedorableStatus") # DEPRECATED
+        # Plain label instead of the deprecated Gtk.Statusbar (whose message stack only grows)
+        self.statusbar = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, height_request=24, margin_start=6, margin_end=6)
+        self._status_label = Gtk.Label(xalign=0, hexpand=True)
+        self.statusbar.append(self._status_label)
         self.main_box.append(self.statusbar)
         self.update_statusbar("Ready.")
 
+    def _setup_output_style(self):
+        from gi.repository import Pango # Only needed here; keeps the typelib off the import path
+        provider = Gtk.CssProvider()
+        provider.load_from_string(OUTPUT_CSS)
+        Gtk.StyleContext.add_provider_for_display(self.output_view.get_display(), provider,
+                                                  Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+        self.output_view.add_css_class("fedorable-output")
+        # Size the stop from the real font so it follows the user's font size and scaling
+        metrics = self.output_view.get_pango_context().get_metrics(
+            Pango.FontDescription.from_string("monospace"), None)
+        tabs = Pango.TabArray.new(1, False) # Pango units, straight from the metrics
+        tabs.set_tab(0, Pango.TabAlign.LEFT, OUTPUT_TAB_COLUMNS * metrics.get_approximate_digit_width())
+        self.output_view.set_tabs(tabs)
+
+    def on_wrap_toggled(self, button):
+        self.output_view.set_wrap_mode(Gtk.WrapMode.WORD_CHAR if button.get_active() else Gtk.WrapMode.NONE)
+
     def update_statusbar(self, text):
-        # Still use the deprecated method for now
-        self.statusbar.push(self.statusbar_context_id, text) # DEPRECATED
+        self._status_label.set_text(text)
 
     def show_error_dialog(self, primary_text, secondary_text):
         dialog = Adw.MessageDialog(transient_for=self, modal=True)
@@ -197,8 +279,7 @@ class FedorableMainWindow(Adw.ApplicationWindow):
         dialog.present()
 
     def on_clear_clicked(self, button):
-        buffer = self.output_view.get_buffer()
-        buffer.set_text("")
+        self._buffer.set_text("")
         self.update_statusbar("Output cleared.")
 
     def set_controls_sensitive(self, sensitive):
@@ -208,72 +289,156 @@ class FedorableMainWindow(Adw.ApplicationWindow):
         for sw in self.option_switches.values():
             sw.set_sensitive(sensitive)
         self.clear_button.set_sensitive(sensitive) # Enable/disable clear button too
-
-    def build_command(self):
-        command = ["pkexec", FEDORABLE_SCRIPT_PATH]
-        for key, cb in self.task_checkboxes.items():
-            if not cb.get_active():
-                command.append(f"--no-{key.replace('_', '-')}")
-        for key, sw in self.option_switches.items():
-            is_active = sw.get_active()
-            if is_active:
-                if key == "yes": command.append("--yes")
-                elif key == "dry_run": command.append("--dry-run")
-                elif key == "email_report": command.append("--email-report")
-                elif key == "check_only": command.append("--check-only")
-                elif key.startswith("perform_"): command.append(f"--{key.replace('_', '-')}")
-        return command
+        self.separate_stderr_check.set_sensitive(sensitive)
+
+    def _compile_build_command(self):
+        """Generates build_command() specialized to the current widgets.
+
+        The command starts from _CMD_PREFIX, adds the --no-* flag of every unchecked task and the
+        flag of every active option. Each widget becomes a global of the generated function and
+        each flag a string constant, so a Run click does no dict iteration or key lookups.
+        """
+        namespace = {}
+        body = [f"    command = {list(_CMD_PREFIX)!r}"]
+        for i, (key, cb) in enumerate(self.task_checkboxes.items()):
+            namespace[f"task_{i}"] = cb
+            body.append(f"    if not task_{i}.get_active(): command.append({self._task_flag[key]!r})")
+        for i, (key, sw) in enumerate(self.option_switches.items()):
+            namespace[f"option_{i}"] = sw
+            body.append(f"    if option_{i}.get_active(): command.append({self._option_flag[key]!r})")
+        source = "def build_command():\n" + "\n".join(body) + "\n    return command\n"
+        exec(compile(source, "<fedorable build_command>", "exec"), namespace)
+        return namespace["build_command"]
 
     def append_output(self, text, tag):
-        buffer = self.output_view.get_buffer()
+        buffer = self._buffer
         buffer.insert_with_tags(buffer.get_end_iter(), text, tag)
-        adj = self.output_view.get_parent().get_vadjustment()
-        # Check if near the bottom before auto-scrolling
-        if adj.get_value() >= adj.get_upper() - adj.get_page_size() - 50: # Add tolerance
-             adj.set_value(adj.get_upper() - adj.get_page_size())
         return False # For GLib.idle_add
 
-    def handle_stream(self, channel, condition, tag):
-        """Reads from stdout or stderr channel."""
-        if condition & GLib.IOCondition.HUP:
-            return False # Stop watching if channel closed
+    def _on_output_scrolled(self, adj, pspec):
+        # Follow the tail while the user is within 50px of the bottom
+        self._follow_tail = adj.get_value() >= adj.get_upper() - adj.get_page_size() - 50
 
+    def _on_output_grown(self, adj, pspec):
+        # Auto-scroll once GTK has laid out the new text, but only if we were following
+        if self._follow_tail:
+            adj.set_value(adj.get_upper() - adj.get_page_size())
+
+    def _queue_output(self, text, tag):
+        """Buffers text and schedules a single flush for everything queued in the next 30ms."""
+        if not text:
+            return
+        with self._pending_lock:
+            if tag is self.stderr_tag:
+                self._pending_stderr.append(text)
+            else:
+                self._pending_stdout.append(text)
+            if self._flush_source_id is None:
+                self._flush_source_id = GLib.timeout_add(30, self._flush_pending)
+
+    def _flush_pending(self):
+        """Inserts all buffered output with at most one insert per tag (runs on main thread)."""
+        with self._pending_lock:
+            stdout_chunks, self._pending_stdout = self._pending_stdout, []
+            stderr_chunks, self._pending_stderr = self._pending_stderr, []
+            self._flush_source_id = None
+
+        buffer = self._buffer
+        if stdout_chunks and self._merge_output:
+            buffer.insert(buffer.get_end_iter(), "".join(stdout_chunks))
+        elif stdout_chunks:
+            buffer.insert_with_tags(buffer.get_end_iter(), "".join(stdout_chunks), self.stdout_tag)
+        if stderr_chunks:
+            buffer.insert_with_tags(buffer.get_end_iter(), "".join(stderr_chunks), self.stderr_tag)
+        self._trim_output(buffer)
+        return GLib.SOURCE_REMOVE
+
+    def _trim_output(self, buffer):
+        """Moves the oldest whole lines to the spill file so layout/redraw cost stays bounded."""
+        char_count = buffer.get_char_count()
+        if char_count <= OUTPUT_MAX_CHARS:
+            return
+        cut = buffer.get_iter_at_offset(char_count - OUTPUT_TRIM_CHARS)
+        if not cut.forward_line():
+            # Cut landed on the (very long) last line; cut mid-line rather than wiping everything
+            cut = buffer.get_iter_at_offset(char_count - OUTPUT_TRIM_CHARS)
+        start = buffer.get_start_iter()
+        self._spill_output(buffer.get_text(start, cut, False))
+        buffer.delete(start, cut)
+
+    def _spill_output(self, text):
         try:
-            # Read all available data non-blockingly
-            # size, data = channel.read_chars() # Might be better for binary
-            # Use readline for text mode
-            status, line, length = channel.read_line()
-            if status == GLib.IOStatus.NORMAL and line:
-                 GLib.idle_add(self.append_output, line, tag)
-            elif status == GLib.IOStatus.EOF:
-                 return False # End of file
-            elif status == GLib.IOStatus.AGAIN:
-                 pass # No data right now, try again
-            else: # Error
-                 GLib.idle_add(self.append_output, f"\n[GUI Error reading stream: {status}]\n", self.stderr_tag)
-                 return False
-        except GLib.Error as e:
-            print(f"Error reading stream: {e}")
-            GLib.idle_add(self.append_output, f"\n[GUI Error reading stream: {e}]\n", self.stderr_tag)
-            return False
-        except Exception as e: # Catch other potential errors
+            if self._spill_file is None:
+                os.makedirs(OUTPUT_SPILL_DIR, exist_ok=True)
+                spill_path = os.path.join(OUTPUT_SPILL_DIR, f"output_{time.strftime('%Y%m%d_%H%M%S')}.log")
+                self._spill_file = open(spill_path, "a", encoding="utf-8")
+                self._prune_spill_files()
+                self.update_statusbar(f"Older output moved to {spill_path}")
+            self._spill_file.write(text)
+        except OSError as e:
+            print(f"Error saving trimmed output: {e}")
+
+    def _prune_spill_files(self):
+        """Deletes all but the newest OUTPUT_SPILL_KEEP spill files (names sort by timestamp)."""
+        spills = sorted(name for name in os.listdir(OUTPUT_SPILL_DIR)
+                        if name.startswith("output_") and name.endswith(".log"))
+        for name in spills[:-OUTPUT_SPILL_KEEP]:
+            try:
+                os.remove(os.path.join(OUTPUT_SPILL_DIR, name))
+            except OSError as e:
+                print(f"Error removing old output file {name}: {e}")
+
+    def _close_spill(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def start_reader(self, stream, tag):
+        threading.Thread(target=self.handle_stream, args=(stream, tag), daemon=True).start()
+
+    def handle_stream(self, stream, tag):
+        """Reads raw blocks from stdout or stderr until EOF (runs in a reader thread)."""
+        # The GIO stream keeps ownership of the fd; we only borrow it for blocking reads
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        try:
+            with os.fdopen(stream.get_fd(), "rb", buffering=READ_CHUNK_SIZE, closefd=False) as pipe:
+                while chunk := pipe.read1(READ_CHUNK_SIZE):
+                    self._queue_output(decoder.decode(chunk), tag)
+            self._queue_output(decoder.decode(b"", final=True), tag)
+        except Exception as e:
             print(f"Unexpected error reading stream: {e}")
-            GLib.idle_add(self.append_output, f"\n[GUI Unexpected error reading stream: {e}]\n", self.stderr_tag)
-            return False
-
-        return True # Continue watching
+            self._queue_output(f"\n[GUI Unexpected error reading stream: {e}]\n", self.stderr_tag)
+        # End of stream (or error)
+        GLib.idle_add(self._on_stream_closed)
 
+    def _on_stream_closed(self):
+        self._open_streams -= 1
+        self._maybe_finish()
+        return False # For GLib.idle_add
 
-    def process_finished(self, pid, status, user_data=None): # Added user_data for clarity
-        """Callback when the subprocess finishes."""
-        success = os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
-        exit_status_val = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1 # Get exit code or -1 if signaled
-        GLib.idle_add(self._finalize_run, success, exit_status_val)
-        self.process = None
+    def process_finished(self, process, result):
+        """Callback after Gio.Subprocess.wait_async finishes."""
+        try:
+            process.wait_finish(result)
+            self._exit_status = process.get_exit_status() if process.get_if_exited() else -1 # -1 if signaled
+        except GLib.Error as e:
+            print(f"Error waiting for process: {e.message}")
+            self._queue_output(f"\n[GUI Communication Error: {e.message}]\n", self.stderr_tag)
+            self._exit_status = -1
+        self._maybe_finish()
 
+    def _maybe_finish(self):
+        """Finalizes the run once the process has exited and both streams are drained."""
+        if self._open_streams == 0 and self._exit_status is not None:
+            self.process = None
+            self._finalize_run(self._exit_status == 0, self._exit_status)
 
     def _finalize_run(self, success, exit_status):
         """Update UI after process finishes (runs on main thread)."""
+        if self._flush_source_id is not None:
+            GLib.source_remove(self._flush_source_id)
+            self._flush_pending() # Drain buffered output before the summary banner
+        self._close_spill()
         if success:
             self.update_statusbar("Maintenance finished successfully.")
             self.append_output("\n--- Maintenance Finished Successfully ---\n", self.stdout_tag)
@@ -287,28 +452,38 @@ class FedorableMainWindow(Adw.ApplicationWindow):
         if self.process:
             self.update_statusbar("Maintenance is already running.")
             return
-        if not os.path.exists(FEDORABLE_SCRIPT_PATH):
+        exists, executable = self.get_application().script_status()
+        if not exists:
              self.show_error_dialog("Error: Script not found", f"Cannot run: {FEDORABLE_SCRIPT_PATH}")
              return
-        if not os.access(FEDORABLE_SCRIPT_PATH, os.X_OK):
+        if not executable:
              self.show_error_dialog("Error: Script not executable", f"Cannot run: {FEDORABLE_SCRIPT_PATH}")
              return
 
         command = self.build_command()
         self.on_clear_clicked(None)
+        self._close_spill()
         self.update_statusbar("Starting maintenance...")
-        self.append_output(f"Running command: {' '.join(shlex.quote(c) for c in command)}\n\n", self.stdout_tag)
+        self.append_output(f"Running command: {shlex.join(command)}\n\n", self.stdout_tag)
         self.set_controls_sensitive(False)
 
         try:
             # Spawn async process using GSubprocess
-            self.process = Gio.Subprocess.new(
-                 command,
-                 flags=Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_PIPE
-            )
+            self._merge_output = not self.separate_stderr_check.get_active()
+            if self._merge_output:
+                flags = Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_MERGE
+            else:
+                flags = Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_PIPE
+            self.process = Gio.Subprocess.new(command, flags=flags)
 
-            # Communicate asynchronously to get streams
-            self.process.communicate_utf8_async(None, None, self._on_process_communication_finished)
+            self._open_streams = 1 if self._merge_output else 2
+            self._exit_status = None
+
+            # Stream output as it arrives; blocking reads happen off the main loop
+            self.start_reader(self.process.get_stdout_pipe(), self.stdout_tag)
+            if not self._merge_output:
+                self.start_reader(self.process.get_stderr_pipe(), self.stderr_tag)
+            self.process.wait_async(None, self.process_finished)
 
 
         except GLib.Error as e: # Catch GLib errors during spawn
@@ -323,34 +498,6 @@ class FedorableMainWindow(Adw.ApplicationWindow):
             self._finalize_run(False, -1)
 
 
-    def _on_process_communication_finished(self, process, result):
-        """Callback after Gio.Subprocess.communicate_utf8_async finishes."""
-        try:
-            success, stdout_data, stderr_data = process.communicate_utf8_finish(result)
-
-            if stdout_data:
-                 self.append_output(stdout_data, self.stdout_tag)
-            if stderr_data:
-                 self.append_output(stderr_data, self.stderr_tag)
-
-            # Use get_exit_status() after communication finishes
-            exit_status = process.get_exit_status()
-            self._finalize_run(exit_status == 0, exit_status)
-
-        except GLib.Error as e:
-            error_msg = f"Error during process communication: {e.message}"
-            print(error_msg)
-            self.append_output(f"\n[GUI Communication Error: {e.message}]\n", self.stderr_tag)
-            self._finalize_run(False, process.get_exit_status() if process.get_if_exited() else -1)
-        except Exception as e:
-             error_msg = f"Unexpected error during process communication: {e}"
-             print(error_msg)
-             self.append_output(f"\n[GUI Unexpected Communication Error: {e}]\n", self.stderr_tag)
-             self._finalize_run(False, process.get_if_exited() if process.get_if_exited() else -1)
-        finally:
-             self.process = None # Clear process reference
-
-
 
 # --- Main Execution ---
 if __name__ == "__main__":